@@ -9,12 +9,20 @@ Includes: environment setup, parameter management, audit logging, error handling
 
 import os
 import json
-from datetime import datetime, timedelta
+import time
+import functools
+from datetime import datetime, date, timedelta
 from typing import Dict, Any, List, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field, fields
 from enum import Enum
 import logging
 
+try:
+    import orjson
+    import structlog
+except ImportError:  # Fall back to stdlib logging
+    orjson = structlog = None
+
 # ============================================================================
 # ENUMERATIONS
 # ============================================================================
@@ -45,9 +53,9 @@ class Environment(Enum):
 # DATACLASSES FOR TYPE SAFETY
 # ============================================================================
 
-@dataclass
+@dataclass(frozen=True)
 class PipelineConfig:
-    """Global pipeline configuration"""
+    """Global pipeline configuration (immutable, so to_dict is cached)"""
     catalog_name: str = "fintech_analytics"
     environment: str = "production"
     run_mode: str = "incremental"
@@ -57,9 +65,19 @@ class PipelineConfig:
     enable_data_quality: bool = True
     enable_audit_logging: bool = True
     timeout_minutes: int = 60
+    max_parallel_tasks: int = 8  # Independent tasks run concurrently
+    _dict_cache: Optional[Dict[str, Any]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
     
     def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+        """Shallow field dict, built once; treat the result as read-only"""
+        if self._dict_cache is None:
+            object.__setattr__(self, '_dict_cache', {
+                f.name: getattr(self, f.name)
+                for f in fields(self) if f.name != '_dict_cache'
+            })
+        return self._dict_cache
 
 @dataclass
 class TaskConfig:
@@ -71,6 +89,10 @@ class TaskConfig:
     max_retries: int = 2
     critical: bool = True  # If fails, stop pipeline
     skip_on_condition: Optional[str] = None
+    code_version: str = "1"  # Bump when task logic changes (invalidates causal cache)
+    content_hash_inputs: List[str] = field(default_factory=list)  # Delta tables or /Volumes paths read
+    content_hash_outputs: List[str] = field(default_factory=list)  # Delta tables written (checked on cache hit)
+    report_rows: bool = False  # SQL tasks: count result rows (costs an extra action)
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
@@ -100,10 +122,30 @@ class PipelineRun:
 # LOGGING CONFIGURATION
 # ============================================================================
 
-def setup_logging(log_level: str = "INFO") -> logging.Logger:
-    """Configure structured logging for pipeline"""
+def _orjson_serializer(value: Any, **kwargs) -> str:
+    return orjson.dumps(value, default=str).decode()
+
+def setup_logging(log_level: str = "INFO"):
+    """
+    Configure structured logging for pipeline.
+    Emits NDJSON via structlog + orjson when installed, else stdlib logging.
+    """
+    level = getattr(logging, log_level)
+    
+    if structlog is not None:
+        structlog.configure(
+            processors=[
+                structlog.processors.add_log_level,
+                structlog.processors.TimeStamper(fmt="iso", utc=True),
+                structlog.processors.JSONRenderer(serializer=_orjson_serializer),
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(level),
+            cache_logger_on_first_use=True,
+        )
+        return structlog.get_logger().bind(logger="fintech_pipeline")
+    
     logger = logging.getLogger("fintech_pipeline")
-    logger.setLevel(getattr(logging, log_level))
+    logger.setLevel(level)
     
     # Console handler
     handler = logging.StreamHandler()
@@ -129,7 +171,18 @@ PIPELINE_TASKS = {
         depends_on=[],
         timeout_minutes=30,
         max_retries=2,
-        critical=True
+        critical=True,
+        content_hash_inputs=[
+            "/Volumes/fintech_analytics/raw_data/sec_files/insider_transactions_data.csv",
+            "/Volumes/fintech_analytics/raw_data/sec_files/institutional_holdings_data.csv"
+        ],
+        content_hash_outputs=[
+            "fintech_analytics.silver.silver_dim_insiders",
+            "fintech_analytics.silver.silver_dim_institutions",
+            "fintech_analytics.silver.silver_dim_companies",
+            "fintech_analytics.silver.silver_fact_insider_transactions",
+            "fintech_analytics.silver.silver_fact_institutional_holdings"
+        ]
     ),
     "gold_analytics": TaskConfig(
         task_name="gold_analytics",
@@ -138,6 +191,7 @@ PIPELINE_TASKS = {
         timeout_minutes=20,
         max_retries=2,
         critical=True
+        # Not causally cached: it only (re)creates views, which have no Delta version to verify
     ),
     "table_optimization": TaskConfig(
         task_name="table_optimization",
@@ -213,8 +267,9 @@ PARTITION_STRATEGY = {
 # HELPER FUNCTIONS
 # ============================================================================
 
+@functools.lru_cache(maxsize=1)
 def get_execution_context() -> Dict[str, Any]:
-    """Extract Databricks execution context"""
+    """Extract Databricks execution context (constant for a run, so cached)"""
     try:
         dbutils = globals().get("dbutils")
         if dbutils:
@@ -233,32 +288,43 @@ def get_execution_context() -> Dict[str, Any]:
     }
 
 def generate_run_id() -> str:
-    """Generate unique run identifier"""
-    return datetime.now().strftime("%Y%m%d_%H%M%S")
+    """Generate unique, time-sortable run identifier (hex nanoseconds since epoch)"""
+    return f"r{time.time_ns():x}"
+
+_FULL_START_DATE = date(2020, 1, 1)  # Arbitrary start
+_REPAIR_LOOKBACK = timedelta(days=1)
+
+# run_mode -> start date given (end_date, lookback_days); unknown modes use repair
+_START_DATE_BY_MODE = {
+    RunMode.FULL.value: lambda end_date, lookback_days: _FULL_START_DATE,
+    RunMode.INCREMENTAL.value: lambda end_date, lookback_days: end_date - timedelta(days=lookback_days),
+}
+
+def _repair_start_date(end_date: date, lookback_days: int) -> date:
+    return end_date - _REPAIR_LOOKBACK
 
 def get_execution_date_range(run_mode: str, lookback_days: int = 7) -> tuple:
     """Calculate date range for data processing"""
-    end_date = datetime.now()
-    
-    if run_mode == "full":
-        start_date = datetime(2020, 1, 1)  # Arbitrary start
-    elif run_mode == "incremental":
-        start_date = end_date - timedelta(days=lookback_days)
-    else:
-        start_date = end_date - timedelta(days=1)
-    
-    return (start_date.date(), end_date.date())
+    end_date = date.today()
+    start_date = _START_DATE_BY_MODE.get(run_mode, _repair_start_date)(end_date, lookback_days)
+    return (start_date, end_date)
 
 def flatten_dict(d: Dict, parent_key: str = '', sep: str = '.') -> Dict:
-    """Flatten nested dictionary for logging"""
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
+    """Flatten nested dictionary for logging (iterative, keeps insertion order)"""
+    flat = {}
+    stack = [(parent_key, iter(d.items()))]
+    while stack:
+        prefix, items = stack[-1]
+        for k, v in items:
+            new_key = f"{prefix}{sep}{k}" if prefix else k
+            if isinstance(v, dict):
+                # Descend now; this level resumes from its iterator afterwards
+                stack.append((new_key, iter(v.items())))
+                break
+            flat[new_key] = v
         else:
-            items.append((new_key, v))
-    return dict(items)
+            stack.pop()
+    return flat
 
 
 # ============================================================================
@@ -6,13 +6,134 @@ Production-grade audit tables, error tracking, and recovery mechanisms.
 ======================================================================================
 """
 
-from datetime import datetime
-from typing import Dict, Any, List, Optional
+from datetime import datetime, date
+from typing import Dict, Any, List, Optional, Tuple
+import os
 import json
+import time
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson  # C-level serializer, ~3x faster than stdlib json
+except ImportError:
+    orjson = None
+
+from pyspark.sql import functions as F
+from pyspark.sql.utils import AnalysisException
+from pyspark.sql.types import (
+    StructType, StructField, StringType, IntegerType, LongType,
+    TimestampType, DateType
+)
 
 LOGGER = None  # Will be injected from config
 
+# ============================================================================
+# AUDIT ROW SCHEMAS (typed DataFrame writes, no SQL string building)
+# ============================================================================
+
+PIPELINE_RUNS_SCHEMA = StructType([
+    StructField("run_id", StringType(), False),
+    StructField("execution_date", DateType(), False),
+    StructField("environment", StringType(), True),
+    StructField("run_mode", StringType(), True),
+    StructField("total_tasks", IntegerType(), True),
+    StructField("successful_tasks", IntegerType(), True),
+    StructField("failed_tasks", IntegerType(), True),
+    StructField("skipped_tasks", IntegerType(), True),
+    StructField("status", StringType(), True),
+    StructField("start_time", TimestampType(), True),
+    StructField("end_time", TimestampType(), True),
+    StructField("duration_seconds", LongType(), True),
+    StructField("error_summary", StringType(), True),
+    StructField("created_at", TimestampType(), True),
+    StructField("updated_at", TimestampType(), True),
+])
+
+TASK_RUNS_SCHEMA = StructType([
+    StructField("run_id", StringType(), False),
+    StructField("execution_date", DateType(), True),
+    StructField("task_name", StringType(), False),
+    StructField("task_type", StringType(), True),
+    StructField("execution_order", IntegerType(), True),
+    StructField("attempt", IntegerType(), True),
+    StructField("status", StringType(), True),
+    StructField("start_time", TimestampType(), True),
+    StructField("end_time", TimestampType(), True),
+    StructField("duration_seconds", LongType(), True),
+    StructField("rows_processed", LongType(), True),
+    StructField("rows_inserted", LongType(), True),
+    StructField("rows_updated", LongType(), True),
+    StructField("error_message", StringType(), True),
+    StructField("error_type", StringType(), True),
+    StructField("stack_trace", StringType(), True),
+    StructField("created_at", TimestampType(), True),
+])
+
+DATA_QUALITY_CHECKS_SCHEMA = StructType([
+    StructField("run_id", StringType(), False),
+    StructField("table_name", StringType(), False),
+    StructField("check_name", StringType(), False),
+    StructField("check_type", StringType(), True),
+    StructField("expected_value", StringType(), True),
+    StructField("actual_value", StringType(), True),
+    StructField("status", StringType(), True),
+    StructField("message", StringType(), True),
+    StructField("execution_date", DateType(), True),
+    StructField("created_at", TimestampType(), True),
+])
+
+REPAIR_HISTORY_SCHEMA = StructType([
+    StructField("repair_id", StringType(), False),
+    StructField("original_run_id", StringType(), False),
+    StructField("original_task_name", StringType(), False),
+    StructField("repair_type", StringType(), True),
+    StructField("repair_status", StringType(), True),
+    StructField("rows_reprocessed", LongType(), True),
+    StructField("attempted_at", TimestampType(), True),
+    StructField("completed_at", TimestampType(), True),
+    StructField("notes", StringType(), True),
+    StructField("created_at", TimestampType(), True),
+])
+
+CAUSAL_CACHE_SCHEMA = StructType([
+    StructField("task_name", StringType(), False),
+    StructField("content_hash", StringType(), False),
+    StructField("output_snapshot_id", StringType(), True),
+    StructField("run_id", StringType(), True),
+    StructField("created_at", TimestampType(), True),
+])
+
+AUDIT_FLUSH_THRESHOLD = 100  # Buffered rows before an automatic flush
+DEBUG_TRACES = os.getenv("LOG_LEVEL", "INFO").upper() == "DEBUG"  # Full traces in task_runs
+ERROR_LOG_VOLUME = "error_log_files"  # Unity Catalog volume for NDJSON error files
+
+
+def _to_json(value: Any) -> str:
+    """Serialize a value to JSON text, preferring orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str).decode()
+    return json.dumps(value, default=str)
+
+
+def _as_date(value) -> Optional[date]:
+    """Coerce an ISO date string (or date/datetime) to a date"""
+    if value is None or type(value) is date:
+        return value
+    if isinstance(value, datetime):
+        return value.date()
+    return date.fromisoformat(str(value))
+
+
+def _append_rows(spark, table: str, rows: List[Tuple], row_schema: StructType) -> None:
+    """Write rows to a Delta table in a single append; values are bound, never quoted"""
+    (spark.createDataFrame(rows, row_schema)
+        .write.format("delta")
+        .mode("append")
+        .saveAsTable(table))
+
+
 # ============================================================================
 # AUDIT SCHEMA INITIALIZATION
 # ============================================================================
@@ -24,13 +145,21 @@ def initialize_audit_tables(spark, catalog: str = "fintech_analytics",
     These tables track pipeline execution and enable debugging/recovery.
     """
     
-    # Create audit schema if not exists
+    # Create audit schema if not exists (tables below depend on it)
     spark.sql(f"CREATE SCHEMA IF NOT EXISTS {catalog}.{schema}")
     
+    # Volume for the NDJSON error files that load_error_log copies into error_log
+    spark.sql(f"CREATE VOLUME IF NOT EXISTS {catalog}.{schema}.{ERROR_LOG_VOLUME}")
+    LOGGER.info(f"✅ Created: volume {catalog}.{schema}.{ERROR_LOG_VOLUME}")
+    
+    # The table DDLs are independent, so they are submitted as one
+    # concurrent wave instead of six sequential metastore round-trips.
+    ddls: Dict[str, str] = {}
+    
     # ========================================================================
     # TABLE 1: Pipeline Runs
     # ========================================================================
-    spark.sql(f"""
+    ddls["pipeline_runs"] = f"""
     CREATE TABLE IF NOT EXISTS {catalog}.{schema}.pipeline_runs (
         run_id STRING NOT NULL,
         execution_date DATE NOT NULL,
@@ -50,16 +179,15 @@ def initialize_audit_tables(spark, catalog: str = "fintech_analytics",
     )
     USING DELTA
     PARTITIONED BY (execution_date)
-    """)
-    
-    LOGGER.info(f"✅ Created: {catalog}.{schema}.pipeline_runs")
+    """
     
     # ========================================================================
     # TABLE 2: Task Execution Details
     # ========================================================================
-    spark.sql(f"""
+    ddls["task_runs"] = f"""
     CREATE TABLE IF NOT EXISTS {catalog}.{schema}.task_runs (
         run_id STRING NOT NULL,
+        execution_date DATE,
         task_name STRING NOT NULL,
         task_type STRING,
         execution_order INT,
@@ -77,22 +205,20 @@ def initialize_audit_tables(spark, catalog: str = "fintech_analytics",
         created_at TIMESTAMP DEFAULT current_timestamp()
     )
     USING DELTA
-    PARTITIONED BY (run_id)
-    """)
-    
-    LOGGER.info(f"✅ Created: {catalog}.{schema}.task_runs")
+    PARTITIONED BY (execution_date)
+    """
     
     # ========================================================================
     # TABLE 3: Data Quality Checks
     # ========================================================================
-    spark.sql(f"""
+    ddls["data_quality_checks"] = f"""
     CREATE TABLE IF NOT EXISTS {catalog}.{schema}.data_quality_checks (
         run_id STRING NOT NULL,
         table_name STRING NOT NULL,
         check_name STRING NOT NULL,
         check_type STRING,
-        expected_value ANY,
-        actual_value ANY,
+        expected_value STRING,
+        actual_value STRING,
         status STRING,
         message STRING,
         execution_date DATE,
@@ -100,14 +226,12 @@ def initialize_audit_tables(spark, catalog: str = "fintech_analytics",
     )
     USING DELTA
     PARTITIONED BY (execution_date)
-    """)
-    
-    LOGGER.info(f"✅ Created: {catalog}.{schema}.data_quality_checks")
+    """
     
     # ========================================================================
     # TABLE 4: Incremental Watermarks (for state tracking)
     # ========================================================================
-    spark.sql(f"""
+    ddls["watermarks"] = f"""
     CREATE TABLE IF NOT EXISTS {catalog}.{schema}.watermarks (
         source_table STRING NOT NULL,
         target_table STRING NOT NULL,
@@ -117,14 +241,12 @@ def initialize_audit_tables(spark, catalog: str = "fintech_analytics",
         updated_at TIMESTAMP DEFAULT current_timestamp()
     )
     USING DELTA
-    """)
-    
-    LOGGER.info(f"✅ Created: {catalog}.{schema}.watermarks")
+    """
     
     # ========================================================================
     # TABLE 5: Error Log (rapid lookup)
     # ========================================================================
-    spark.sql(f"""
+    ddls["error_log"] = f"""
     CREATE TABLE IF NOT EXISTS {catalog}.{schema}.error_log (
         error_id STRING NOT NULL,
         run_id STRING,
@@ -139,14 +261,12 @@ def initialize_audit_tables(spark, catalog: str = "fintech_analytics",
         created_at TIMESTAMP DEFAULT current_timestamp()
     )
     USING DELTA
-    """)
-    
-    LOGGER.info(f"✅ Created: {catalog}.{schema}.error_log")
+    """
     
     # ========================================================================
     # TABLE 6: Repair History (tracks recovery attempts)
     # ========================================================================
-    spark.sql(f"""
+    ddls["repair_history"] = f"""
     CREATE TABLE IF NOT EXISTS {catalog}.{schema}.repair_history (
         repair_id STRING NOT NULL,
         original_run_id STRING NOT NULL,
@@ -160,30 +280,154 @@ def initialize_audit_tables(spark, catalog: str = "fintech_analytics",
         created_at TIMESTAMP DEFAULT current_timestamp()
     )
     USING DELTA
+    """
+    
+    # ========================================================================
+    # TABLE 7: Causal Cache (task input hash -> produced output)
+    # ========================================================================
+    ddls["causal_cache"] = f"""
+    CREATE TABLE IF NOT EXISTS {catalog}.{schema}.causal_cache (
+        task_name STRING NOT NULL,
+        content_hash STRING NOT NULL,
+        output_snapshot_id STRING,
+        run_id STRING,
+        created_at TIMESTAMP DEFAULT current_timestamp()
+    )
+    USING DELTA
+    """
+    
+    with ThreadPoolExecutor(max_workers=len(ddls)) as executor:
+        list(executor.map(spark.sql, ddls.values()))
+    
+    for table in ddls:
+        LOGGER.info(f"✅ Created: {catalog}.{schema}.{table}")
+    
+    # CREATE TABLE IF NOT EXISTS leaves older tables as they were
+    migrate_audit_tables(spark, catalog, schema)
+    
+    # ========================================================================
+    # CURRENT-STATE VIEWS (task_runs / pipeline_runs are append-only)
+    # ========================================================================
+    spark.sql(f"""
+    CREATE OR REPLACE VIEW {catalog}.{schema}.task_runs_current AS
+    SELECT * EXCEPT (rn) FROM (
+        SELECT *, row_number() OVER (
+            PARTITION BY run_id, task_name ORDER BY created_at DESC
+        ) AS rn
+        FROM {catalog}.{schema}.task_runs
+    )
+    WHERE rn = 1
     """)
     
-    LOGGER.info(f"✅ Created: {catalog}.{schema}.repair_history")
+    spark.sql(f"""
+    CREATE OR REPLACE VIEW {catalog}.{schema}.pipeline_runs_current AS
+    SELECT * EXCEPT (rn) FROM (
+        SELECT *, row_number() OVER (
+            PARTITION BY run_id ORDER BY created_at DESC
+        ) AS rn
+        FROM {catalog}.{schema}.pipeline_runs
+    )
+    WHERE rn = 1
+    """)
+    
+    LOGGER.info(f"✅ Created: {catalog}.{schema}.task_runs_current, pipeline_runs_current")
     
     print("\n" + "="*80)
     print("✅ AUDIT INFRASTRUCTURE INITIALIZED")
     print("="*80)
 
 
+def optimize_audit_tables(spark, catalog: str = "fintech_analytics",
+                          schema: str = "audit") -> None:
+    """
+    Compact the date-partitioned task_runs table and cluster it on run_id,
+    so per-run lookups stay selective without one partition per run.
+    """
+    spark.sql(f"OPTIMIZE {catalog}.{schema}.task_runs ZORDER BY (run_id)")
+    
+    LOGGER.info(f"✅ Optimized: {catalog}.{schema}.task_runs")
+
+
+def migrate_audit_tables(spark, catalog: str = "fintech_analytics",
+                         schema: str = "audit") -> None:
+    """
+    Bring audit tables created by earlier versions up to the current schemas.
+    task_runs gained execution_date (written by every task row); without it
+    each flush fails with a Delta schema mismatch. Existing tables keep their
+    original (unpartitioned) layout.
+    """
+    table = f"{catalog}.{schema}.task_runs"
+    columns = {c.name for c in spark.catalog.listColumns(table)}
+    if "execution_date" not in columns:
+        spark.sql(f"ALTER TABLE {table} ADD COLUMNS (execution_date DATE AFTER run_id)")
+        LOGGER.info(f"✅ Migrated: {table} (+ execution_date)")
+
+
+def default_error_log_dir(catalog: str = "fintech_analytics", schema: str = "audit") -> str:
+    """Volume path holding the NDJSON error sidecar files"""
+    return f"/Volumes/{catalog}/{schema}/{ERROR_LOG_VOLUME}"
+
+
+def load_error_log(spark, catalog: str = "fintech_analytics", schema: str = "audit",
+                   error_log_dir: Optional[str] = None) -> None:
+    """
+    Load NDJSON error files into the error_log Delta table.
+    Intended for a nightly job; COPY INTO skips files it has already loaded.
+    """
+    error_log_dir = error_log_dir or default_error_log_dir(catalog, schema)
+    
+    spark.sql(f"""
+    COPY INTO {catalog}.{schema}.error_log
+    FROM (
+        SELECT error_id, run_id, task_name, error_type, error_message,
+               full_traceback, context_data, severity,
+               CAST(is_resolved AS BOOLEAN) AS is_resolved, resolution_notes,
+               CAST(created_at AS TIMESTAMP) AS created_at
+        FROM '{error_log_dir}'
+    )
+    FILEFORMAT = JSON
+    """)
+    
+    LOGGER.info(f"✅ Loaded error files from {error_log_dir} into {catalog}.{schema}.error_log")
+
+
 # ============================================================================
 # AUDIT LOGGER CLASS
 # ============================================================================
 
 class AuditLogger:
-    """Centralized audit logging for pipeline execution"""
+    """
+    Centralized audit logging for pipeline execution.
+
+    Task and data quality rows are buffered in memory and written with a
+    single DataFrame append per table on flush(), instead of one spark.sql
+    round-trip per event. task_runs and pipeline_runs are append-only: every
+    state transition is a new row, and the *_current views expose the
+    latest state, so no Delta UPDATE (file rewrite) is ever issued.
+    Errors are appended as NDJSON lines under error_log_dir and loaded into
+    error_log in bulk by load_error_log().
+    """
     
     def __init__(self, spark, catalog: str = "fintech_analytics", 
-                 schema: str = "audit"):
+                 schema: str = "audit", error_log_dir: Optional[str] = None):
         self.spark = spark
         self.catalog = catalog
         self.schema = schema
+        self.error_log_dir = error_log_dir or default_error_log_dir(catalog, schema)
+        self._error_file = None  # NDJSON appender, opened per run
         self.run_id = None
         self.execution_date = None
         self.current_task = None
+        self._run_info = None  # (environment, run_mode, total_tasks, start_time)
+        
+        self._task_starts: Dict[str, Tuple] = {}  # task_name -> (type, order, attempt, start_time)
+        self._start_ns: Dict[str, int] = {}       # task_name -> time.monotonic_ns() at start
+        self._run_start_ns = None
+        self._task_buffer: List[Tuple] = []
+        self._dq_buffer: List[Tuple] = []
+        self._lock = threading.Lock()  # Tasks may log from worker threads
+        self._causal_cache_df = None  # Resolved once, reused by get_cached_output
+        self._causal_cache_missing = False  # Deployments created before causal_cache
         
     def start_run(self, run_id: str, execution_date: str, 
                   environment: str, run_mode: str, total_tasks: int) -> None:
@@ -191,20 +435,14 @@ class AuditLogger:
         self.run_id = run_id
         self.execution_date = execution_date
         
-        self.spark.sql(f"""
-        INSERT INTO {self.catalog}.{self.schema}.pipeline_runs 
-        (run_id, execution_date, environment, run_mode, total_tasks, 
-         status, start_time)
-        VALUES (
-            '{run_id}',
-            '{execution_date}',
-            '{environment}',
-            '{run_mode}',
-            {total_tasks},
-            'RUNNING',
-            current_timestamp()
-        )
-        """)
+        now = datetime.now()
+        self._run_info = (environment, run_mode, total_tasks, now)
+        self._run_start_ns = time.monotonic_ns()
+        self._close_error_file()  # This run's file is opened on its first error
+        _append_rows(self.spark, self._table("pipeline_runs"), [(
+            run_id, _as_date(execution_date), environment, run_mode, total_tasks,
+            None, None, None, "RUNNING", now, None, None, None, now, now
+        )], PIPELINE_RUNS_SCHEMA)
         
         print(f"🚀 Pipeline started: {run_id}")
     
@@ -212,149 +450,263 @@ class AuditLogger:
                       execution_order: int, attempt: int = 1) -> None:
         """Record task execution start"""
         self.current_task = task_name
+        start_time = datetime.now()
+        self._task_starts[task_name] = (task_type, execution_order, attempt, start_time)
+        self._start_ns[task_name] = time.monotonic_ns()
         
-        self.spark.sql(f"""
-        INSERT INTO {self.catalog}.{self.schema}.task_runs
-        (run_id, task_name, task_type, execution_order, attempt, 
-         status, start_time)
-        VALUES (
-            '{self.run_id}',
-            '{task_name}',
-            '{task_type}',
-            {execution_order},
-            {attempt},
-            'RUNNING',
-            current_timestamp()
-        )
-        """)
+        with self._lock:
+            self._task_buffer.append((
+                self.run_id, _as_date(self.execution_date), task_name,
+                task_type, execution_order, attempt, "RUNNING",
+                start_time, None, None, None, None, None,
+                None, None, None, start_time
+            ))
+        self._flush_if_full()
         
         print(f"  ⚙️  Task: {task_name} (attempt {attempt})")
     
+    def _buffer_task_row(self, task_name: str, status: str,
+                         rows_processed: int = None, rows_inserted: int = None,
+                         rows_updated: int = None, error_message: str = None,
+                         error_type: str = None, stack_trace: str = None) -> None:
+        """Append a task_runs state-transition row carrying the completion fields"""
+        end_ns = time.monotonic_ns()
+        end_time = datetime.now()
+        task_type, execution_order, attempt, start_time = self._task_starts.pop(
+            task_name, (None, None, None, end_time)
+        )
+        duration_seconds = (end_ns - self._start_ns.pop(task_name, end_ns)) // 1_000_000_000
+        
+        with self._lock:
+            self._task_buffer.append((
+                self.run_id, _as_date(self.execution_date), task_name,
+                task_type, execution_order, attempt, status,
+                start_time, end_time, duration_seconds,
+                rows_processed, rows_inserted, rows_updated,
+                error_message, error_type, stack_trace, end_time
+            ))
+        self._flush_if_full()
+    
     def log_task_success(self, task_name: str, rows_processed: int = 0,
                         rows_inserted: int = 0, rows_updated: int = 0) -> None:
         """Record task completion"""
-        self.spark.sql(f"""
-        UPDATE {self.catalog}.{self.schema}.task_runs
-        SET 
-            status = 'SUCCESS',
-            end_time = current_timestamp(),
-            duration_seconds = CAST(UNIX_TIMESTAMP(current_timestamp()) - 
-                                   UNIX_TIMESTAMP(start_time) AS LONG),
-            rows_processed = {rows_processed},
-            rows_inserted = {rows_inserted},
-            rows_updated = {rows_updated}
-        WHERE run_id = '{self.run_id}' 
-          AND task_name = '{task_name}'
-          AND status = 'RUNNING'
-        """)
+        self._buffer_task_row(
+            task_name, "SUCCESS",
+            rows_processed=rows_processed,
+            rows_inserted=rows_inserted,
+            rows_updated=rows_updated
+        )
         
         print(f"    ✅ {task_name} succeeded (rows: {rows_processed})")
     
     def log_task_failure(self, task_name: str, error: Exception, 
-                        stack_trace: str = None) -> None:
-        """Record task failure and error details"""
+                        stack_trace: str = None, capture_trace: bool = False) -> None:
+        """
+        Record task failure and error details.
+        task_runs gets the one-line exception summary; the full traceback
+        (passed in, or captured when capture_trace / LOG_LEVEL=DEBUG) goes to
+        the NDJSON error sidecar.
+        """
         error_type = type(error).__name__
-        error_message = str(error).replace("'", "''")  # Escape quotes
-        stack_trace = stack_trace or traceback.format_exc()
+        error_summary = "".join(traceback.format_exception_only(type(error), error)).strip()
+        if stack_trace is None and (capture_trace or DEBUG_TRACES):
+            stack_trace = traceback.format_exc()
         
-        # Update task status
-        self.spark.sql(f"""
-        UPDATE {self.catalog}.{self.schema}.task_runs
-        SET 
-            status = 'FAILED',
-            end_time = current_timestamp(),
-            duration_seconds = CAST(UNIX_TIMESTAMP(current_timestamp()) - 
-                                   UNIX_TIMESTAMP(start_time) AS LONG),
-            error_type = '{error_type}',
-            error_message = '{error_message}'
-        WHERE run_id = '{self.run_id}' 
-          AND task_name = '{task_name}'
-          AND status = 'RUNNING'
-        """)
+        # Terminal task row
+        self._buffer_task_row(
+            task_name, "FAILED",
+            error_message=str(error),
+            error_type=error_type,
+            stack_trace=stack_trace if DEBUG_TRACES else error_summary
+        )
         
-        # Log error details
-        error_id = f"{self.run_id}_{task_name}_{int(datetime.now().timestamp())}"
+        # Log error details (NDJSON sidecar, bulk-loaded into error_log)
+        error_id = f"{self.run_id}_{task_name}_{time.time_ns()}"
         
-        self.spark.sql(f"""
-        INSERT INTO {self.catalog}.{self.schema}.error_log
-        (error_id, run_id, task_name, error_type, error_message, 
-         full_traceback, severity)
-        VALUES (
-            '{error_id}',
-            '{self.run_id}',
-            '{task_name}',
-            '{error_type}',
-            '{error_message}',
-            '{stack_trace.replace("'", "''")}',
-            'ERROR'
-        )
-        """)
+        self._write_error({
+            "error_id": error_id,
+            "run_id": self.run_id,
+            "task_name": task_name,
+            "error_type": error_type,
+            "error_message": str(error),
+            "full_traceback": stack_trace or error_summary,
+            "context_data": None,
+            "severity": "ERROR",
+            "is_resolved": False,
+            "resolution_notes": None,
+            "created_at": datetime.now().isoformat()
+        })
         
         print(f"    ❌ {task_name} failed: {error_type}")
     
     def log_task_skip(self, task_name: str, reason: str) -> None:
         """Record task skip"""
-        self.spark.sql(f"""
-        INSERT INTO {self.catalog}.{self.schema}.task_runs
-        (run_id, task_name, status, start_time, end_time)
-        VALUES (
-            '{self.run_id}',
-            '{task_name}',
-            'SKIPPED',
-            current_timestamp(),
-            current_timestamp()
-        )
-        """)
+        self._buffer_task_row(task_name, "SKIPPED")
         
         print(f"    ⏭️  {task_name} skipped ({reason})")
     
+    def get_cached_output(self, task_name: str, content_hash: str) -> Optional[str]:
+        """
+        Return the output snapshot recorded for (task_name, content_hash), if any.
+        A missing causal_cache table counts as a miss for the rest of the run.
+        """
+        if self._causal_cache_missing:
+            return None
+        
+        try:
+            if self._causal_cache_df is None:
+                self._causal_cache_df = self.spark.table(self._table("causal_cache"))
+            
+            rows = (self._causal_cache_df
+                .filter((F.col("task_name") == task_name) & (F.col("content_hash") == content_hash))
+                .orderBy(F.col("created_at").desc())
+                .select("output_snapshot_id")
+                .take(1))
+        except AnalysisException as e:
+            print(f"  ⚠️  Causal cache unavailable ({type(e).__name__}); running tasks uncached")
+            self._causal_cache_missing = True
+            return None
+        return rows[0]["output_snapshot_id"] if rows else None
+    
+    def record_cached_output(self, task_name: str, content_hash: str,
+                             output_snapshot_id: str) -> None:
+        """Record the output versions a task produced for this content hash"""
+        _append_rows(self.spark, self._table("causal_cache"), [(
+            task_name, content_hash, output_snapshot_id,
+            self.run_id, datetime.now()
+        )], CAUSAL_CACHE_SCHEMA)
+    
     def log_data_quality_check(self, table_name: str, check_name: str,
                               check_type: str, status: str, 
                               expected: Any = None, actual: Any = None,
                               message: str = "") -> bool:
         """Log data quality validation result"""
-        expected_str = json.dumps(expected) if expected else "NULL"
-        actual_str = json.dumps(actual) if actual else "NULL"
-        
-        self.spark.sql(f"""
-        INSERT INTO {self.catalog}.{self.schema}.data_quality_checks
-        (run_id, table_name, check_name, check_type, expected_value, 
-         actual_value, status, message, execution_date)
-        VALUES (
-            '{self.run_id}',
-            '{table_name}',
-            '{check_name}',
-            '{check_type}',
-            '{expected_str.replace("'", "''")}',
-            '{actual_str.replace("'", "''")}',
-            '{status}',
-            '{message.replace("'", "''")}',
-            '{self.execution_date}'
+        row = (
+            self.run_id,
+            table_name,
+            check_name,
+            check_type,
+            _to_json(expected) if expected is not None else None,
+            _to_json(actual) if actual is not None else None,
+            status,
+            message,
+            _as_date(self.execution_date),
+            datetime.now()
         )
-        """)
+        with self._lock:
+            self._dq_buffer.append(row)
+        self._flush_if_full()
         
         icon = "✅" if status == "PASS" else "⚠️"
         print(f"    {icon} {table_name}.{check_name}: {status}")
         
         return status == "PASS"
     
+    def log_data_quality_checks(self, checks: List[Dict[str, Any]]) -> bool:
+        """
+        Log many data quality results at once (log_data_quality_check kwargs
+        per item); they land in the buffer together and reach Delta in one append.
+        """
+        now = datetime.now()
+        execution_date = _as_date(self.execution_date)
+        rows = [
+            (
+                self.run_id,
+                check["table_name"],
+                check["check_name"],
+                check.get("check_type", check["check_name"]),
+                _to_json(check["expected"]) if check.get("expected") is not None else None,
+                _to_json(check["actual"]) if check.get("actual") is not None else None,
+                check["status"],
+                check.get("message", ""),
+                execution_date,
+                now
+            )
+            for check in checks
+        ]
+        with self._lock:
+            self._dq_buffer.extend(rows)
+        self._flush_if_full()
+        
+        passed = sum(1 for check in checks if check["status"] == "PASS")
+        print(f"    📋 Logged {len(checks)} quality checks ({passed} passed)")
+        
+        return passed == len(checks)
+    
+    def _table(self, name: str) -> str:
+        return f"{self.catalog}.{self.schema}.{name}"
+    
+    def _open_error_file(self) -> None:
+        """Open this run's NDJSON error file: <error_log_dir>/dt=<date>/<run_id>.jsonl"""
+        self._close_error_file()
+        partition_dir = os.path.join(self.error_log_dir, f"dt={_as_date(self.execution_date)}")
+        os.makedirs(partition_dir, exist_ok=True)
+        self._error_file = open(
+            os.path.join(partition_dir, f"{self.run_id}.jsonl"), "a", encoding="utf-8"
+        )
+    
+    def _close_error_file(self) -> None:
+        if self._error_file is not None:
+            self._error_file.close()
+            self._error_file = None
+    
+    def _write_error(self, record: Dict[str, Any]) -> None:
+        line = _to_json(record) + "\n"
+        with self._lock:
+            if self._error_file is None:
+                self._open_error_file()
+            self._error_file.write(line)
+            self._error_file.flush()
+    
+    def _flush_if_full(self) -> None:
+        if len(self._task_buffer) + len(self._dq_buffer) > AUDIT_FLUSH_THRESHOLD:
+            self.flush()
+    
+    def flush(self) -> None:
+        """Write all buffered task and data quality rows (re-buffered if the append fails)"""
+        with self._lock:
+            task_rows, self._task_buffer = self._task_buffer, []
+            dq_rows, self._dq_buffer = self._dq_buffer, []
+        
+        if task_rows:
+            try:
+                _append_rows(self.spark, self._table("task_runs"),
+                             task_rows, TASK_RUNS_SCHEMA)
+            except Exception:
+                with self._lock:
+                    self._task_buffer[:0] = task_rows
+                    self._dq_buffer[:0] = dq_rows
+                raise
+        
+        if dq_rows:
+            try:
+                _append_rows(self.spark, self._table("data_quality_checks"),
+                             dq_rows, DATA_QUALITY_CHECKS_SCHEMA)
+            except Exception:
+                with self._lock:
+                    self._dq_buffer[:0] = dq_rows
+                raise
+    
     def end_run(self, overall_status: str, successful_tasks: int,
                failed_tasks: int, skipped_tasks: int, 
                error_summary: str = "") -> None:
         """Record pipeline run completion"""
-        self.spark.sql(f"""
-        UPDATE {self.catalog}.{self.schema}.pipeline_runs
-        SET 
-            status = '{overall_status}',
-            end_time = current_timestamp(),
-            duration_seconds = CAST(UNIX_TIMESTAMP(current_timestamp()) - 
-                                   UNIX_TIMESTAMP(start_time) AS LONG),
-            successful_tasks = {successful_tasks},
-            failed_tasks = {failed_tasks},
-            skipped_tasks = {skipped_tasks},
-            error_summary = '{error_summary.replace("'", "''")}'
-        WHERE run_id = '{self.run_id}'
-        """)
+        self.flush()
+        self._close_error_file()
+        
+        end_ns = time.monotonic_ns()
+        end_time = datetime.now()
+        environment, run_mode, total_tasks, start_time = self._run_info or (
+            None, None, None, end_time
+        )
+        duration_seconds = (end_ns - (self._run_start_ns or end_ns)) // 1_000_000_000
+        
+        _append_rows(self.spark, self._table("pipeline_runs"), [(
+            self.run_id, _as_date(self.execution_date), environment, run_mode,
+            total_tasks, successful_tasks, failed_tasks, skipped_tasks,
+            overall_status, start_time, end_time, duration_seconds,
+            error_summary, end_time, end_time
+        )], PIPELINE_RUNS_SCHEMA)
         
         icon = "✅" if overall_status == "SUCCESS" else "❌"
         print(f"\n{icon} Pipeline {overall_status}: {self.run_id}")
@@ -366,54 +718,54 @@ class AuditLogger:
 # ============================================================================
 
 class ErrorRecovery:
-    """Handles error recovery and repair workflows"""
+    """
+    Handles error recovery and repair workflows.
+    Lookup tables are resolved to DataFrames once and filtered with Column
+    expressions, so repeated lookups skip SQL parsing and table resolution.
+    """
     
     def __init__(self, spark, catalog: str, schema: str = "audit"):
         self.spark = spark
         self.catalog = catalog
         self.schema = schema
+        self._tables: Dict[str, Any] = {}  # table name -> DataFrame
+    
+    def _table_df(self, name: str):
+        if name not in self._tables:
+            self._tables[name] = self.spark.table(f"{self.catalog}.{self.schema}.{name}")
+        return self._tables[name]
     
     def record_repair_attempt(self, original_run_id: str, task_name: str,
                             repair_type: str, rows_reprocessed: int = 0) -> str:
         """Record repair attempt in history"""
-        repair_id = f"{original_run_id}_repair_{int(datetime.now().timestamp())}"
+        repair_id = f"{original_run_id}_repair_{time.time_ns()}"
+        now = datetime.now()
         
-        self.spark.sql(f"""
-        INSERT INTO {self.catalog}.{self.schema}.repair_history
-        (repair_id, original_run_id, original_task_name, repair_type, 
-         repair_status, rows_reprocessed, attempted_at)
-        VALUES (
-            '{repair_id}',
-            '{original_run_id}',
-            '{task_name}',
-            '{repair_type}',
-            'COMPLETED',
-            {rows_reprocessed},
-            current_timestamp()
-        )
-        """)
+        _append_rows(self.spark, f"{self.catalog}.{self.schema}.repair_history", [(
+            repair_id, original_run_id, task_name, repair_type, "COMPLETED",
+            rows_reprocessed, now, None, None, now
+        )], REPAIR_HISTORY_SCHEMA)
         
         return repair_id
     
     def get_failed_tasks(self, run_id: str) -> List[Dict[str, Any]]:
         """Retrieve failed tasks from a run"""
-        return self.spark.sql(f"""
-        SELECT task_name, error_type, error_message
-        FROM {self.catalog}.{self.schema}.task_runs
-        WHERE run_id = '{run_id}' AND status = 'FAILED'
-        """).collect()
+        return (self._table_df("task_runs_current")
+            .filter((F.col("run_id") == run_id) & (F.col("status") == "FAILED"))
+            .select("task_name", "error_type", "error_message")
+            .collect())
     
     def can_repair(self, run_id: str, task_name: str) -> bool:
         """Determine if a task can be repaired"""
-        result = self.spark.sql(f"""
-        SELECT COUNT(*) as attempt_count
-        FROM {self.catalog}.{self.schema}.task_runs
-        WHERE run_id = '{run_id}' 
-          AND task_name = '{task_name}'
-          AND status = 'FAILED'
-        """).collect()[0]['attempt_count']
+        failed = (self._table_df("task_runs")
+            .filter(
+                (F.col("run_id") == run_id)
+                & (F.col("task_name") == task_name)
+                & (F.col("status") == "FAILED")
+            )
+            .take(1))
         
-        return result > 0
+        return len(failed) > 0
 
 
 if __name__ == "__main__":
@@ -6,9 +6,17 @@ Contract-based validation, schema enforcement, and quality gates.
 ======================================================================================
 """
 
-from typing import Dict, List, Any, Tuple, Optional
+import threading
+from typing import Callable, Dict, List, Any, Tuple, Optional
 from dataclasses import dataclass
 from enum import Enum
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pyspark import StorageLevel
+
+# Small or low-cardinality uniqueness checks aggregate over few partitions
+SMALL_TABLE_ROWS = 1_000_000
+SMALL_SHUFFLE_PARTITIONS = 8
 
 class CheckStatus(Enum):
     PASS = "PASS"
@@ -35,14 +43,82 @@ class DataQualityValidator:
         self.audit_logger = audit_logger
         self.checks_passed = 0
         self.checks_failed = 0
+        self._schema_cache = {}           # table -> {column: type}
+        self._schema_contract_cache = {}  # (table, contract items) -> passing result
+        self._sql_cache: Dict[Tuple, List[str]] = {}  # (kind, check spec) -> fused expressions
+        self._cache_lock = threading.Lock()  # Caches are shared by run_all_checks_parallel
+    
+    def invalidate_schema_cache(self, table_name: str) -> None:
+        """Forget the memoized schema and schema-contract results of a table"""
+        with self._cache_lock:
+            self._schema_cache.pop(table_name, None)
+            for key in [k for k in self._schema_contract_cache if k[0] == table_name]:
+                del self._schema_contract_cache[key]
         
-    def validate_table_exists(self, table_name: str) -> QualityCheckResult:
-        """Check if table exists"""
-        try:
-            count = self.spark.sql(f"SELECT COUNT(*) FROM {table_name}").collect()[0][0]
+    def _fast_row_count(self, table_name: str) -> int:
+        """
+        Row count via a bare COUNT(*). DESCRIBE DETAIL exposes no row count, but
+        Delta answers an unfiltered COUNT(*) from the per-file statistics in its
+        transaction log without scanning data files.
+        """
+        return self.spark.sql(f"SELECT COUNT(*) FROM {table_name}").collect()[0][0]
+    
+    def _get_table_stats(self, table_name: str) -> Dict[str, Any]:
+        """Table statistics used by the checks (row count via _fast_row_count)"""
+        return {"num_records": self._fast_row_count(table_name)}
+    
+    def _fused_exprs(self, kind: str, spec: Tuple,
+                     build: Callable[[], List[str]]) -> List[str]:
+        """Fused aggregation expressions for a (hashable) check spec, built once per spec"""
+        key = (kind, spec)
+        exprs = self._sql_cache.get(key)
+        if exprs is None:
+            exprs = build()
+            with self._cache_lock:
+                exprs = self._sql_cache.setdefault(key, exprs)
+        return exprs
+    
+    def _source(self, table_name: str, df=None):
+        """DataFrame to validate: the shared one from run_all_checks, else the table"""
+        return df if df is not None else self.spark.table(table_name)
+    
+    def _uniqueness_partitions(self, table_name: str, contract: Dict[str, Any],
+                               table_context: Dict[str, Any]) -> Optional[int]:
+        """
+        Partitions for the uniqueness aggregation; None keeps the session default.
+        Sized from table stats only when the row-count check already fetched them.
+        """
+        if contract.get('low_cardinality'):
+            return SMALL_SHUFFLE_PARTITIONS
+        stats = table_context.get("stats")
+        if stats and stats["num_records"] < SMALL_TABLE_ROWS:
+            return SMALL_SHUFFLE_PARTITIONS
+        return None
+    
+    def _build_table_context(self, table_name: str, need_stats: bool = False) -> Dict[str, Any]:
+        """Catalog metadata shared by the checks of one run_all_checks call"""
+        exists = self.spark.catalog.tableExists(table_name)
+        return {
+            "exists": exists,
+            "columns": [c.name for c in self.spark.catalog.listColumns(table_name)] if exists else [],
+            "stats": self._get_table_stats(table_name) if exists and need_stats else None
+        }
+    
+    def validate_table_exists(self, table_name: str,
+                              table_context: Optional[Dict[str, Any]] = None) -> QualityCheckResult:
+        """Check if table exists (catalog lookup; row count from metadata when available)"""
+        if table_context:
+            exists = table_context["exists"]
+            stats = table_context.get("stats")
+            count = stats["num_records"] if stats else None
+        else:
+            exists = self.spark.catalog.tableExists(table_name)
+            count = self._fast_row_count(table_name) if exists else None
+        
+        if exists:
             status = CheckStatus.PASS
-            message = f"Table exists with {count} rows"
-        except:
+            message = f"Table exists with {count} rows" if count is not None else "Table exists"
+        else:
             status = CheckStatus.FAIL
             message = f"Table {table_name} does not exist"
             count = 0
@@ -56,11 +132,14 @@ class DataQualityValidator:
         )
     
     def validate_required_columns(self, table_name: str, 
-                                 required_cols: List[str]) -> QualityCheckResult:
+                                 required_cols: List[str],
+                                 table_context: Optional[Dict[str, Any]] = None) -> QualityCheckResult:
         """Verify all required columns exist"""
         try:
-            df = self.spark.sql(f"SELECT * FROM {table_name} LIMIT 1")
-            actual_cols = set(df.columns)
+            if table_context:
+                actual_cols = set(table_context["columns"])
+            else:
+                actual_cols = {c.name for c in self.spark.catalog.listColumns(table_name)}
             required_set = set(required_cols)
             missing = required_set - actual_cols
             
@@ -88,16 +167,21 @@ class DataQualityValidator:
             )
     
     def validate_not_null(self, table_name: str, columns: List[str],
-                         max_null_percentage: float = 5.0) -> List[QualityCheckResult]:
-        """Check for null values in critical columns"""
+                         max_null_percentage: float = 5.0, df=None) -> List[QualityCheckResult]:
+        """Check for null values in critical columns (one aggregate scan)"""
         results = []
         
         try:
-            df = self.spark.sql(f"SELECT * FROM {table_name}")
-            total_rows = df.count()
+            agg_exprs = self._fused_exprs("not_null", tuple(columns), lambda: ["COUNT(*) AS total"] + [
+                f"SUM(CASE WHEN `{col}` IS NULL THEN 1 ELSE 0 END) AS null_{i}"
+                for i, col in enumerate(columns)
+            ])
+            row = self._source(table_name, df).selectExpr(*agg_exprs).collect()[0]
+            # Positional layout as built above: total, then one null count per column
+            total_rows = row[0]
             
-            for col in columns:
-                null_count = df.filter(f"{col} IS NULL").count()
+            for i, col in enumerate(columns, 1):
+                null_count = row[i] or 0
                 null_percentage = (null_count / total_rows * 100) if total_rows > 0 else 0
                 
                 if null_percentage <= max_null_percentage:
@@ -126,10 +210,12 @@ class DataQualityValidator:
         return results
     
     def validate_row_count(self, table_name: str, min_rows: int = 0,
-                          max_rows: Optional[int] = None) -> QualityCheckResult:
-        """Validate table has expected row count"""
+                          max_rows: Optional[int] = None,
+                          table_context: Optional[Dict[str, Any]] = None) -> QualityCheckResult:
+        """Validate table has expected row count (from table stats when available)"""
         try:
-            actual_count = self.spark.sql(f"SELECT COUNT(*) FROM {table_name}").collect()[0][0]
+            stats = table_context.get("stats") if table_context else None
+            actual_count = stats["num_records"] if stats else self._fast_row_count(table_name)
             
             if actual_count < min_rows:
                 status = CheckStatus.FAIL
@@ -158,24 +244,27 @@ class DataQualityValidator:
             )
     
     def validate_numeric_range(self, table_name: str, column: str,
-                              min_value: float, max_value: float) -> QualityCheckResult:
-        """Validate numeric column values are within range"""
+                              min_value: float, max_value: float, df=None) -> QualityCheckResult:
+        """
+        Validate numeric column values are within range.
+        A bare aggregate over the column (nulls are ignored by MIN/MAX/COUNT
+        and never out of range), so only that column is read.
+        """
         try:
-            result = self.spark.sql(f"""
-            SELECT 
-                MIN({column}) as min_val,
-                MAX({column}) as max_val,
-                COUNT(*) as total_rows,
-                SUM(CASE WHEN {column} < {min_value} OR {column} > {max_value} THEN 1 ELSE 0 END) as out_of_range
-            FROM {table_name}
-            WHERE {column} IS NOT NULL
-            """).collect()[0]
+            min_val, max_val, _, out_of_range = (self._source(table_name, df)
+                .selectExpr(
+                    f"MIN(`{column}`) as min_val",
+                    f"MAX(`{column}`) as max_val",
+                    f"COUNT(`{column}`) as total_rows",
+                    f"SUM(CASE WHEN `{column}` < {min_value} OR `{column}` > {max_value} THEN 1 ELSE 0 END) as out_of_range"
+                )
+                .collect()[0])
             
-            out_of_range = result['out_of_range'] or 0
+            out_of_range = out_of_range or 0
             
             if out_of_range == 0:
                 status = CheckStatus.PASS
-                message = f"{column}: all values in range [{result['min_val']}, {result['max_val']}]"
+                message = f"{column}: all values in range [{min_val}, {max_val}]"
             else:
                 status = CheckStatus.FAIL
                 message = f"{column}: {out_of_range} values outside range [{min_value}, {max_value}]"
@@ -186,7 +275,7 @@ class DataQualityValidator:
                 status=status,
                 message=message,
                 expected=f"[{min_value}, {max_value}]",
-                actual=f"[{result['min_val']}, {result['max_val']}]"
+                actual=f"[{min_val}, {max_val}]"
             )
         except Exception as e:
             return QualityCheckResult(
@@ -196,21 +285,108 @@ class DataQualityValidator:
                 message=f"Error validating numeric range: {str(e)}"
             )
     
-    def validate_uniqueness(self, table_name: str, columns: List[str]) -> QualityCheckResult:
-        """Check for duplicate key combinations"""
+    def validate_numeric_ranges_bulk(self, table_name: str,
+                                    ranges: Dict[str, Tuple[float, float]],
+                                    df=None) -> List[QualityCheckResult]:
+        """Validate several numeric ranges with one aggregate scan"""
+        def build() -> List[str]:
+            exprs = []
+            for i, (col, (min_value, max_value)) in enumerate(ranges.items()):
+                exprs.append(f"MIN(`{col}`) AS min_{i}")
+                exprs.append(f"MAX(`{col}`) AS max_{i}")
+                exprs.append(
+                    f"SUM(CASE WHEN `{col}` < {min_value} OR `{col}` > {max_value} "
+                    f"THEN 1 ELSE 0 END) AS oor_{i}"
+                )
+            return exprs
+        
+        try:
+            spec = tuple((col, tuple(bounds)) for col, bounds in ranges.items())
+            exprs = self._fused_exprs("numeric_ranges", spec, build)
+            row = self._source(table_name, df).selectExpr(*exprs).collect()[0]
+        except Exception as e:
+            return [
+                QualityCheckResult(
+                    check_name=f"numeric_range_{col}",
+                    table_name=table_name,
+                    status=CheckStatus.FAIL,
+                    message=f"Error validating numeric range: {str(e)}"
+                )
+                for col in ranges
+            ]
+        
+        # Positional layout as built above: (min, max, out_of_range) per column
+        results = []
+        for i, (col, (min_value, max_value)) in enumerate(ranges.items()):
+            min_val, max_val, out_of_range = row[3 * i], row[3 * i + 1], row[3 * i + 2]
+            out_of_range = out_of_range or 0
+            
+            if out_of_range == 0:
+                status = CheckStatus.PASS
+                message = f"{col}: all values in range [{min_val}, {max_val}]"
+            else:
+                status = CheckStatus.FAIL
+                message = f"{col}: {out_of_range} values outside range [{min_value}, {max_value}]"
+            
+            results.append(QualityCheckResult(
+                check_name=f"numeric_range_{col}",
+                table_name=table_name,
+                status=status,
+                message=message,
+                expected=f"[{min_value}, {max_value}]",
+                actual=f"[{min_val}, {max_val}]"
+            ))
+        
+        return results
+    
+    def validate_uniqueness(self, table_name: str, columns: List[str],
+                            df=None, mode: str = "exact",
+                            partitions: Optional[int] = None) -> QualityCheckResult:
+        """
+        Check for duplicate key combinations.
+        Two-phase aggregation (GROUP BY keys, then sum the group counts) keeps
+        the distinct computation distributed instead of a single COUNT(DISTINCT).
+        mode="exists" only answers pass/fail: the GROUP BY shuffle still runs in
+        full, but the final stage skips the totals and returns after one
+        duplicate group, and no count is reported.
+        partitions coalesces the aggregated groups into that many partitions
+        (after the map-side partial aggregate), without touching the session conf.
+        """
         try:
-            col_str = ", ".join(columns)
-            result = self.spark.sql(f"""
-            SELECT 
-                COUNT(*) as total_rows,
-                COUNT(DISTINCT ({col_str})) as unique_keys
-            FROM {table_name}
-            WHERE {' AND '.join([f'{c} IS NOT NULL' for c in columns])}
-            """).collect()[0]
+            keys = (self._source(table_name, df)
+                .where(' AND '.join([f'{c} IS NOT NULL' for c in columns])))
+            groups = keys.groupBy(*columns).count()
+            if partitions is not None:
+                groups = groups.coalesce(partitions)
             
-            total = result['total_rows']
-            unique = result['unique_keys']
-            duplicates = total - unique
+            if mode == "exists":
+                found = groups.where("`count` > 1").take(1)
+                if not found:
+                    status = CheckStatus.PASS
+                    message = "No duplicate key combinations"
+                else:
+                    status = CheckStatus.FAIL
+                    message = "Duplicate key combinations found"
+                
+                return QualityCheckResult(
+                    check_name=f"unique_{','.join(columns)}",
+                    table_name=table_name,
+                    status=status,
+                    message=message,
+                    expected="0 duplicates",
+                    actual=None  # Duplicates are detected, not counted, in this mode
+                )
+            
+            total, duplicates, unique = (groups
+                .selectExpr(
+                    "SUM(`count`) as total_rows",
+                    "SUM(CASE WHEN `count` > 1 THEN `count` - 1 ELSE 0 END) as duplicates",
+                    "COUNT(*) as unique_keys"
+                )
+                .collect()[0])
+            
+            total = total or 0
+            duplicates = duplicates or 0
             
             if duplicates == 0:
                 status = CheckStatus.PASS
@@ -236,11 +412,28 @@ class DataQualityValidator:
             )
     
     def validate_schema_contract(self, table_name: str, 
-                                expected_schema: Dict[str, str]) -> QualityCheckResult:
-        """Validate table schema matches contract"""
+                                expected_schema: Dict[str, str],
+                                schema=None) -> QualityCheckResult:
+        """
+        Validate table schema matches contract.
+        A passed-in schema is always checked as given. Without one, passing
+        results are memoized per (table, contract) until invalidate_schema_cache,
+        so repeat validations skip the schema fetch.
+        """
+        cache_key = (table_name, frozenset(expected_schema.items()))
+        if schema is None:
+            cached = self._schema_contract_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
-            df = self.spark.sql(f"SELECT * FROM {table_name} LIMIT 1")
-            actual_schema = {field.name: field.dataType.simpleString() for field in df.schema}
+            actual_schema = self._schema_cache.get(table_name) if schema is None else None
+            if actual_schema is None:
+                if schema is None:
+                    schema = self.spark.table(table_name).schema
+                actual_schema = {field.name: field.dataType.simpleString() for field in schema}
+                with self._cache_lock:
+                    self._schema_cache[table_name] = actual_schema
             
             mismatches = []
             for col, expected_type in expected_schema.items():
@@ -256,7 +449,7 @@ class DataQualityValidator:
                 status = CheckStatus.FAIL
                 message = f"Schema mismatches: {', '.join(mismatches)}"
             
-            return QualityCheckResult(
+            result = QualityCheckResult(
                 check_name="schema_contract",
                 table_name=table_name,
                 status=status,
@@ -264,6 +457,14 @@ class DataQualityValidator:
                 expected=expected_schema,
                 actual=actual_schema
             )
+            if status == CheckStatus.PASS:
+                with self._cache_lock:
+                    self._schema_contract_cache[cache_key] = result
+            else:
+                # Re-read the schema next time; the table may be fixed by then
+                with self._cache_lock:
+                    self._schema_cache.pop(table_name, None)
+            return result
         except Exception as e:
             return QualityCheckResult(
                 check_name="schema_contract",
@@ -272,54 +473,129 @@ class DataQualityValidator:
                 message=f"Error validating schema: {str(e)}"
             )
     
-    def run_all_checks(self, table_name: str, contract: Dict[str, Any],
-                      audit_logger=None) -> Tuple[bool, List[QualityCheckResult]]:
-        """Run all validation checks for a table"""
-        all_results = []
+    def _collect_results(self, table_name: str, contract: Dict[str, Any],
+                         all_results: List[QualityCheckResult]) -> None:
+        """Run the contract's checks, appending to all_results as they complete"""
+        if contract.get('force_refresh'):
+            self.invalidate_schema_cache(table_name)
+        
+        # Catalog metadata fetched once and shared by the checks below
+        table_context = self._build_table_context(
+            table_name, need_stats='min_rows' in contract
+        )
         
         # 1. Table exists
-        all_results.append(self.validate_table_exists(table_name))
+        all_results.append(self.validate_table_exists(table_name, table_context))
         
         # 2. Required columns
         if 'required_columns' in contract:
             all_results.append(
-                self.validate_required_columns(table_name, contract['required_columns'])
-            )
-        
-        # 3. Not null checks
-        if 'null_checks' in contract:
-            max_null_pct = contract.get('max_null_percentage', 5.0)
-            all_results.extend(
-                self.validate_not_null(table_name, contract['null_checks'], max_null_pct)
+                self.validate_required_columns(
+                    table_name, contract['required_columns'], table_context
+                )
             )
         
-        # 4. Row count
-        if 'min_rows' in contract:
-            all_results.append(
-                self.validate_row_count(table_name, contract['min_rows'])
-            )
+        # One DataFrame/schema shared by every validator; when more than one
+        # check will scan it, only the columns those checks read are persisted.
+        # Columns missing from the table are left out of the projection so their
+        # checks fail individually instead of failing the whole setup.
+        df = self.spark.table(table_name) if table_context["exists"] else None
+        schema = df.schema if df is not None else None
+        scan_checks = (int('null_checks' in contract) + int('numeric_ranges' in contract)
+                       + int('unique_keys' in contract))
+        table_cols = {c.lower() for c in table_context["columns"]}
+        needed_cols = [c for c in dict.fromkeys(
+            list(contract.get('null_checks', []))
+            + list(contract.get('numeric_ranges', {}))
+            + list(contract.get('unique_keys', []))
+        ) if c.lower() in table_cols]
+        persisted = df is not None and scan_checks >= 2 and bool(needed_cols)
+        if persisted:
+            df = df.select(*needed_cols).persist(StorageLevel.MEMORY_AND_DISK)
         
-        # 5. Numeric ranges
-        if 'numeric_ranges' in contract:
-            for col, (min_val, max_val) in contract['numeric_ranges'].items():
+        try:
+            # 3. Not null checks
+            if 'null_checks' in contract:
+                max_null_pct = contract.get('max_null_percentage', 5.0)
+                all_results.extend(
+                    self.validate_not_null(table_name, contract['null_checks'], max_null_pct, df=df)
+                )
+            
+            # 4. Row count
+            if 'min_rows' in contract:
+                all_results.append(
+                    self.validate_row_count(
+                        table_name, contract['min_rows'], table_context=table_context
+                    )
+                )
+            
+            # 5. Numeric ranges
+            if 'numeric_ranges' in contract:
+                all_results.extend(
+                    self.validate_numeric_ranges_bulk(table_name, contract['numeric_ranges'], df=df)
+                )
+            
+            # 6. Uniqueness (pass/fail only unless the contract asks for exact counts);
+            #    small tables aggregate over a handful of partitions
+            if 'unique_keys' in contract:
+                partitions = (self._uniqueness_partitions(table_name, contract, table_context)
+                              if df is not None else None)
                 all_results.append(
-                    self.validate_numeric_range(table_name, col, min_val, max_val)
+                    self.validate_uniqueness(
+                        table_name, contract['unique_keys'], df=df,
+                        mode=contract.get('uniqueness_mode', 'exists'),
+                        partitions=partitions
+                    )
                 )
+            
+            # 7. Schema contract
+            if 'expected_schema' in contract:
+                all_results.append(
+                    self.validate_schema_contract(
+                        table_name, contract['expected_schema'], schema=schema
+                    )
+                )
+        finally:
+            if persisted:
+                df.unpersist()
+    
+    def run_all_checks(self, table_name: str, contract: Dict[str, Any],
+                      audit_logger=None) -> Tuple[bool, List[QualityCheckResult]]:
+        """Run all validation checks for a table"""
+        all_results = []
+        try:
+            self._collect_results(table_name, contract, all_results)
+        except Exception as e:
+            # Metadata lookups (broken view, permissions, ...) fail the table, not the run
+            all_results.append(QualityCheckResult(
+                check_name="check_setup",
+                table_name=table_name,
+                status=CheckStatus.FAIL,
+                message=f"Error preparing checks: {str(e)}"
+            ))
+        
+        # Log results (one bulk call when the logger supports it)
+        if audit_logger:
+            rows = [
+                {
+                    "table_name": result.table_name,
+                    "check_name": result.check_name,
+                    "check_type": result.check_name,
+                    "status": result.status.value,
+                    "expected": result.expected,
+                    "actual": result.actual,
+                    "message": result.message
+                }
+                for result in all_results
+            ]
+            if hasattr(audit_logger, "log_data_quality_checks"):
+                audit_logger.log_data_quality_checks(rows)
+            else:
+                for row in rows:
+                    audit_logger.log_data_quality_check(**row)
         
-        # Log results
         all_passed = True
         for result in all_results:
-            if audit_logger:
-                audit_logger.log_data_quality_check(
-                    table_name=result.table_name,
-                    check_name=result.check_name,
-                    check_type=result.check_name,
-                    status=result.status.value,
-                    expected=result.expected,
-                    actual=result.actual,
-                    message=result.message
-                )
-            
             if result.status != CheckStatus.PASS:
                 all_passed = False
                 if result.severity == "ERROR":
@@ -330,6 +606,54 @@ class DataQualityValidator:
                 print(f"  ✅ {result.check_name}: {result.message}")
         
         return all_passed, all_results
+    
+    def _run_checks_in_pool(self, table_name: str, contract: Dict[str, Any],
+                            audit_logger=None) -> Tuple[bool, List[QualityCheckResult]]:
+        """
+        run_all_checks under a per-table fair scheduler pool. Runs unpooled where
+        sparkContext is unavailable (shared access mode clusters, Spark Connect).
+        """
+        try:
+            sc = self.spark.sparkContext
+            sc.setLocalProperty("spark.scheduler.pool", f"dq_{table_name}")
+        except Exception:
+            sc = None
+        try:
+            return self.run_all_checks(table_name, contract, audit_logger)
+        finally:
+            # Worker threads are reused, so clear the pool for the next table
+            if sc is not None:
+                sc.setLocalProperty("spark.scheduler.pool", None)
+    
+    def run_all_checks_parallel(self, contracts: Dict[str, Dict[str, Any]],
+                                audit_logger=None, max_workers: int = 4
+                                ) -> Dict[str, Tuple[bool, List[QualityCheckResult]]]:
+        """
+        Run run_all_checks for many tables concurrently, keyed by table name.
+        A table whose checks raise gets a FAIL result; the others are kept.
+        """
+        if not contracts:
+            return {}
+        
+        workers = max(1, min(max_workers, len(contracts)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(self._run_checks_in_pool, table_name, contract, audit_logger): table_name
+                for table_name, contract in contracts.items()
+            }
+            results = {}
+            for future in as_completed(futures):
+                table_name = futures[future]
+                try:
+                    results[table_name] = future.result()
+                except Exception as e:
+                    results[table_name] = (False, [QualityCheckResult(
+                        check_name="run_all_checks",
+                        table_name=table_name,
+                        status=CheckStatus.FAIL,
+                        message=f"Error running checks: {str(e)}"
+                    )])
+            return results
 
 
 if __name__ == "__main__":
@@ -7,8 +7,13 @@ Replaces manual notebook orchestration with intelligent workflow.
 ======================================================================================
 """
 
+import os
+import sys
 import time
+import hashlib
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Callable, Optional, Tuple
 from enum import Enum
@@ -23,6 +28,20 @@ class CriticalTaskFailure(Exception):
     pass
 
 
+# Scheduling knobs that do not affect a task's output, excluded from its causal hash
+CAUSAL_HASH_IGNORED_KEYS = {"timeout_minutes", "max_retries", "critical", "skip_on_condition"}
+
+# Adaptive Query Execution settings applied for the duration of a pipeline run:
+# AQE re-plans at shuffle boundaries, splitting skewed join partitions and
+# coalescing small post-shuffle partitions (which auto-tunes the effective
+# spark.sql.shuffle.partitions). Previous session values are restored afterwards.
+AQE_CONF = {
+    "spark.sql.adaptive.enabled": "true",
+    "spark.sql.adaptive.skewJoin.enabled": "true",
+    "spark.sql.adaptive.coalescePartitions.enabled": "true",
+}
+
+
 class TaskExecutionEngine:
     """
     Intelligent task executor with:
@@ -43,10 +62,95 @@ class TaskExecutionEngine:
         self.task_results = {}     # task_name -> {"status": ..., "output": ...}
         self.task_metadata = {}    # task_name -> config
         self.execution_times = {}  # task_name -> duration_seconds
+        self._log_kwargs_cache = {}  # task_name -> static log_task_start kwargs
+        self._skip_cache = {}        # skip_condition -> bool, reset per pipeline run
+        self._task_graph = None      # (names, adj, in_degree) of the last topological_sort
         
     def register_task(self, task_name: str, task_config: Dict[str, Any]) -> None:
         """Register a task in the execution plan"""
         self.task_metadata[task_name] = task_config
+        self._cache_log_kwargs(task_name, task_config)
+    
+    def _cache_log_kwargs(self, task_name: str, task_config: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the per-task log_task_start kwargs once; retries only add the attempt"""
+        kwargs = {
+            "task_name": task_name,
+            "task_type": task_config.get('task_type', 'unknown'),
+            "execution_order": self.execution_order.get(task_name, 0),
+        }
+        self._log_kwargs_cache[task_name] = kwargs
+        return kwargs
+    
+    def _build_task_graph(self, tasks: Dict[str, Dict]) -> Tuple[List[str], List[List[int]]]:
+        """
+        Integer-indexed graph shared by validation and sorting:
+        names[i] is a task, adj[i] lists the indices of tasks depending on it.
+        Raises on dependencies that are not in the task set.
+        """
+        names = list(tasks)
+        idx = {task: i for i, task in enumerate(names)}
+        adj = [[] for _ in names]
+        for i, task in enumerate(names):
+            for dep in tasks[task].get('depends_on', []):
+                j = idx.get(dep)
+                if j is None:
+                    raise TaskDependencyError(
+                        f"Task {task} depends on non-existent task {dep}"
+                    )
+                adj[j].append(i)
+        return names, adj
+    
+    @staticmethod
+    def _find_cycle(adj: List[List[int]]) -> Optional[List[int]]:
+        """Iterative Tarjan SCC; returns the first cyclic component (or self-loop) found"""
+        n = len(adj)
+        index = [-1] * n
+        low = [0] * n
+        on_stack = bytearray(n)
+        stack = []
+        counter = 0
+        
+        for root in range(n):
+            if index[root] >= 0:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [(root, iter(adj[root]))]
+            
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child == node:
+                        return [node]
+                    if index[child] < 0:
+                        index[child] = low[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack[child] = 1
+                        work.append((child, iter(adj[child])))
+                        break
+                    if on_stack[child] and index[child] < low[node]:
+                        low[node] = index[child]
+                else:
+                    # All children done: fold lowlink into the parent, pop a finished SCC
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        if low[node] < low[parent]:
+                            low[parent] = low[node]
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = 0
+                            component.append(member)
+                            if member == node:
+                                break
+                        if len(component) > 1:
+                            return component
+        return None
     
     def validate_dependency_graph(self, tasks: Dict[str, Dict]) -> bool:
         """
@@ -55,38 +159,14 @@ class TaskExecutionEngine:
         - Non-existent dependencies
         - Proper ordering
         """
-        all_tasks = set(tasks.keys())
-        visited = set()
-        rec_stack = set()
-        
-        def has_cycle(task, visited, rec_stack):
-            visited.add(task)
-            rec_stack.add(task)
-            
-            depends_on = tasks.get(task, {}).get('depends_on', [])
-            for dep in depends_on:
-                if dep not in visited:
-                    if has_cycle(dep, visited, rec_stack):
-                        return True
-                elif dep in rec_stack:
-                    return True
-            
-            rec_stack.remove(task)
-            return False
+        names, adj = self._build_task_graph(tasks)
         
-        # Check for cycles
-        for task in all_tasks:
-            if task not in visited:
-                if has_cycle(task, visited, rec_stack):
-                    raise TaskDependencyError(f"Circular dependency detected involving {task}")
-        
-        # Check for non-existent dependencies
-        for task, config in tasks.items():
-            for dep in config.get('depends_on', []):
-                if dep not in all_tasks:
-                    raise TaskDependencyError(
-                        f"Task {task} depends on non-existent task {dep}"
-                    )
+        cycle = self._find_cycle(adj)
+        if cycle is not None:
+            cyclic = sorted(names[i] for i in cycle)
+            raise TaskDependencyError(
+                f"Circular dependency detected involving {', '.join(cyclic)}"
+            )
         
         return True
     
@@ -94,34 +174,44 @@ class TaskExecutionEngine:
         """
         Topologically sort tasks by dependencies.
         Returns list of task names in execution order.
+        Single pass: missing dependencies are rejected while building the
+        graph, and a cycle shows up as tasks Kahn's algorithm never reaches.
         """
-        self.validate_dependency_graph(tasks)
-        
-        in_degree = {task: 0 for task in tasks}
-        adjacency = {task: [] for task in tasks}
-        
-        # Build graph
-        for task, config in tasks.items():
-            for dep in config.get('depends_on', []):
-                adjacency[dep].append(task)
-                in_degree[task] += 1
+        names, adj = self._build_task_graph(tasks)
+        in_degree = [0] * len(names)
+        for children in adj:
+            for child in children:
+                in_degree[child] += 1
+        # Kept for execute_pipeline's scheduler (Kahn below consumes in_degree)
+        self._task_graph = (names, adj, list(in_degree))
         
         # Kahn's algorithm
-        queue = [task for task in tasks if in_degree[task] == 0]
-        result = []
+        queue = deque(i for i, degree in enumerate(in_degree) if degree == 0)
+        order = []
         
         while queue:
-            task = queue.pop(0)
-            result.append(task)
+            node = queue.popleft()
+            order.append(node)
             
-            for neighbor in adjacency[task]:
-                in_degree[neighbor] -= 1
-                if in_degree[neighbor] == 0:
-                    queue.append(neighbor)
+            for child in adj[node]:
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    queue.append(child)
+        
+        if len(order) != len(names):
+            reached = set(order)
+            cyclic = sorted(names[i] for i in range(len(names)) if i not in reached)
+            raise TaskDependencyError(
+                f"Circular dependency detected involving {', '.join(cyclic)}"
+            )
+        
+        result = [names[i] for i in order]
         
         # Record execution order
         for idx, task in enumerate(result, 1):
             self.execution_order[task] = idx
+            if task in self._log_kwargs_cache:
+                self._log_kwargs_cache[task]["execution_order"] = idx
         
         return result
     
@@ -133,19 +223,107 @@ class TaskExecutionEngine:
         if not skip_condition:
             return False
         
+        if skip_condition in self._skip_cache:
+            return self._skip_cache[skip_condition]
+        
+        skip = False
         if skip_condition == "if_no_new_files":
-            # Check watermark table for new data
+            # Check watermark table for new data; one matching row is enough
             try:
-                result = self.spark.sql(f"""
-                SELECT COUNT(*) as new_files
-                FROM fintech_analytics.audit.watermarks
-                WHERE last_processed_date < CURRENT_DATE()
-                """).collect()
-                return result[0]['new_files'] == 0
+                rows = self.spark.sql(
+                    "SELECT 1 FROM fintech_analytics.audit.watermarks "
+                    "WHERE last_processed_date < CURRENT_DATE() LIMIT 1"
+                ).take(1)
+                skip = len(rows) == 0
             except:
                 return False
         
-        return False
+        self._skip_cache[skip_condition] = skip
+        return skip
+    
+    def get_delta_version(self, table_name: str) -> int:
+        """Latest Delta table version (commit number)"""
+        return self.spark.sql(
+            f"DESCRIBE HISTORY {table_name} LIMIT 1"
+        ).collect()[0][0]  # version is the first column
+    
+    def _file_fingerprint(self, path: str) -> str:
+        """(name, size, mtime) of a file, or of every file under a directory"""
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            return f"{stat.st_size}:{stat.st_mtime_ns}"
+        
+        entries = []
+        for root, _, files in os.walk(path):
+            for name in files:
+                stat = os.stat(os.path.join(root, name))
+                entries.append(f"{os.path.relpath(os.path.join(root, name), path)}:"
+                               f"{stat.st_size}:{stat.st_mtime_ns}")
+        if not entries:
+            raise FileNotFoundError(path)
+        return hashlib.sha256("\n".join(sorted(entries)).encode()).hexdigest()
+    
+    def _input_version(self, source: str) -> Optional[str]:
+        """
+        Version token of one cache input: source files (paths starting with /)
+        by size and modification time, tables by Delta version.
+        None when the input is missing, not Delta, or otherwise unresolvable.
+        """
+        try:
+            if source.startswith("/"):
+                return self._file_fingerprint(source)
+            return str(self.get_delta_version(source))
+        except Exception:
+            return None
+    
+    def compute_task_hash(self, task_name: str, task_config: Dict[str, Any],
+                          run_mode: str) -> Optional[str]:
+        """
+        Causal hash of a task: code version + input versions + config + run
+        parameters (run date, mode and lookback window, which the notebooks
+        filter on). Returns None (not cacheable) when the task declares no
+        content_hash_inputs / content_hash_outputs or an input cannot be versioned.
+        """
+        inputs = task_config.get('content_hash_inputs')
+        if not inputs or not task_config.get('content_hash_outputs'):
+            return None
+        
+        versions = []
+        for source in inputs:
+            version = self._input_version(source)
+            if version is None:
+                print(f"    ⚠️  {task_name}: cannot version input {source}, not cacheable")
+                return None
+            versions.append(f"{source}@{version}")
+        input_versions = "|".join(versions)
+        config_subset = {
+            k: v for k, v in task_config.items() if k not in CAUSAL_HASH_IGNORED_KEYS
+        }
+        run_params = {
+            "run_date": datetime.now().strftime("%Y-%m-%d"),
+            "run_mode": run_mode,
+            "lookback_days": self._config_value('lookback_days', None)
+        }
+        payload = "\n".join([
+            task_name,
+            str(task_config.get('code_version', '')),
+            input_versions,
+            json.dumps(config_subset, sort_keys=True, default=str),
+            json.dumps(run_params, sort_keys=True)
+        ])
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _output_snapshot(self, task_config: Dict[str, Any]) -> Optional[str]:
+        """
+        Current Delta version of every content_hash_outputs table, as JSON.
+        None when any output is missing or not Delta.
+        """
+        try:
+            versions = {table: self.get_delta_version(table)
+                        for table in task_config.get('content_hash_outputs', [])}
+        except Exception:
+            return None
+        return json.dumps(versions, sort_keys=True)
     
     def execute_notebook(self, notebook_path: str, parameters: Dict[str, Any],
                         timeout_seconds: int = 1800) -> Dict[str, Any]:
@@ -164,18 +342,28 @@ class TaskExecutionEngine:
             "rows_processed": 1000
         }
     
-    def execute_sql(self, sql_query: str, timeout_seconds: int = 600) -> Dict[str, Any]:
-        """Execute SQL query and return results"""
+    def execute_sql(self, sql_query: str, timeout_seconds: int = 600,
+                    task_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Execute SQL query and return results.
+        Rows are only counted (an extra Spark action) when the task config
+        sets report_rows; otherwise rows_affected is -1.
+        """
         print(f"    🔍 Running SQL query")
         
         try:
             result = self.spark.sql(sql_query)
-            row_count = result.count()
+            if (task_config or {}).get('report_rows', False):
+                row_count = result.count()
+                message = f"Query executed, {row_count} rows"
+            else:
+                row_count = -1
+                message = "Query executed"
             
             return {
                 "status": "SUCCESS",
                 "rows_affected": row_count,
-                "message": f"Query executed, {row_count} rows"
+                "message": message
             }
         except Exception as e:
             raise Exception(f"SQL execution failed: {str(e)}")
@@ -202,18 +390,15 @@ class TaskExecutionEngine:
         """
         attempt = 0
         last_error = None
+        log_kwargs = (self._log_kwargs_cache.get(task_name)
+                      or self._cache_log_kwargs(task_name, task_config))
         
         while attempt <= max_retries:
             attempt += 1
             
             try:
                 # Log start
-                self.audit_logger.log_task_start(
-                    task_name=task_name,
-                    task_type=task_config.get('task_type', 'unknown'),
-                    execution_order=self.execution_order.get(task_name, 0),
-                    attempt=attempt
-                )
+                self.audit_logger.log_task_start(**log_kwargs, attempt=attempt)
                 
                 # Execute
                 start_time = time.time()
@@ -238,7 +423,7 @@ class TaskExecutionEngine:
                 
             except Exception as e:
                 last_error = e
-                error_trace = traceback.format_exc()
+                exc_info = sys.exc_info()  # Formatted only if this is the final attempt
                 
                 print(f"    ⚠️  Attempt {attempt} failed: {type(e).__name__}")
                 
@@ -249,6 +434,7 @@ class TaskExecutionEngine:
                     time.sleep(wait_seconds)
                 else:
                     # Final attempt failed
+                    error_trace = ''.join(traceback.format_exception(*exc_info))
                     self.audit_logger.log_task_failure(
                         task_name=task_name,
                         error=e,
@@ -269,6 +455,87 @@ class TaskExecutionEngine:
             "message": f"Task failed after {max_retries + 1} attempts"
         }
     
+    def _apply_spark_conf(self, settings: Dict[str, str]) -> Dict[str, Optional[str]]:
+        """Set session confs, returning the previous values (None = unset)"""
+        previous = {key: self.spark.conf.get(key, None) for key in settings}
+        for key, value in settings.items():
+            self.spark.conf.set(key, value)
+        return previous
+    
+    def _restore_spark_conf(self, previous: Dict[str, Optional[str]]) -> None:
+        """Undo _apply_spark_conf"""
+        for key, value in previous.items():
+            if value is None:
+                self.spark.conf.unset(key)
+            else:
+                self.spark.conf.set(key, value)
+    
+    def _config_value(self, key: str, default: Any) -> Any:
+        """Read an engine setting from a dict or attribute-style config"""
+        if isinstance(self.config, dict):
+            return self.config.get(key, default)
+        return getattr(self.config, key, default)
+    
+    def _prepare_task(self, task_name: str, task_config: Dict[str, Any],
+                      executors: Dict[str, Callable], run_mode: str,
+                      summary: Dict[str, Any]) -> Optional[Tuple[Callable, Optional[str]]]:
+        """
+        Resolve a ready task before execution.
+        Returns (executor, content_hash) if it should run, or None when it was
+        skipped, served from the causal cache, or failed without running.
+        """
+        # Check skip condition
+        skip_condition = task_config.get('skip_on_condition')
+        if self.should_skip_task(task_name, skip_condition):
+            self.audit_logger.log_task_skip(task_name, skip_condition)
+            self.task_results[task_name] = {"status": "SKIPPED"}
+            summary["skipped_tasks"] += 1
+            return None
+        
+        # Check dependencies
+        can_execute = True
+        for dep in task_config.get('depends_on', []):
+            if self.task_results.get(dep, {}).get('status') != 'SUCCESS':
+                can_execute = False
+                print(f"\n⚠️  {task_name} cannot execute: dependency {dep} failed")
+                break
+        
+        if not can_execute:
+            if task_config.get('critical', True):
+                summary["failed_tasks"] += 1
+                summary["failed_tasks_list"].append(task_name)
+                raise CriticalTaskFailure(f"Critical task {task_name} blocked by failed dependency")
+            else:
+                self.audit_logger.log_task_skip(task_name, "dependency_failed")
+                summary["skipped_tasks"] += 1
+                return None
+        
+        # Execute with retries
+        executor = executors.get(task_name)
+        if not executor:
+            print(f"❌ No executor found for {task_name}")
+            summary["failed_tasks"] += 1
+            summary["failed_tasks_list"].append(task_name)
+            return None
+        
+        # Causal cache: unchanged code+inputs+config already produced this output
+        # (full runs always recompute)
+        content_hash = None
+        if run_mode != "full":
+            content_hash = self.compute_task_hash(task_name, task_config, run_mode)
+            cached = content_hash and self.audit_logger.get_cached_output(task_name, content_hash)
+            if cached:
+                # Only a hit if the outputs are still the versions this hash produced
+                if self._output_snapshot(task_config) == cached:
+                    self.audit_logger.log_task_skip(task_name, "causal-cache-hit")
+                    self.task_results[task_name] = {"status": "SUCCESS", "cached": True}
+                    summary["task_results"][task_name] = self.task_results[task_name]
+                    summary["skipped_tasks"] += 1
+                    return None
+                print(f"    ⚠️  {task_name}: outputs changed since cached run, recomputing")
+        
+        return executor, content_hash
+    
     def execute_pipeline(self, tasks: Dict[str, Dict], 
                         executors: Dict[str, Callable],
                         run_mode: str = "full") -> Tuple[bool, Dict[str, Any]]:
@@ -287,6 +554,8 @@ class TaskExecutionEngine:
         print(f"🚀 STARTING PIPELINE EXECUTION ({run_mode.upper()})")
         print("="*80)
         
+        self._skip_cache.clear()
+        
         # 1. Validate and sort
         try:
             execution_plan = self.topological_sort(tasks)
@@ -309,62 +578,82 @@ class TaskExecutionEngine:
             "failed_tasks_list": []
         }
         
-        for task_name in execution_plan:
-            task_config = tasks[task_name]
-            
-            # Check skip condition
-            skip_condition = task_config.get('skip_on_condition')
-            if self.should_skip_task(task_name, skip_condition):
-                self.audit_logger.log_task_skip(task_name, skip_condition)
-                self.task_results[task_name] = {"status": "SKIPPED"}
-                summary["skipped_tasks"] += 1
-                continue
-            
-            # Check dependencies
-            can_execute = True
-            for dep in task_config.get('depends_on', []):
-                if self.task_results.get(dep, {}).get('status') != 'SUCCESS':
-                    can_execute = False
-                    print(f"\n⚠️  {task_name} cannot execute: dependency {dep} failed")
-                    break
-            
-            if not can_execute:
-                if task_config.get('critical', True):
-                    summary["failed_tasks"] += 1
-                    summary["failed_tasks_list"].append(task_name)
-                    raise CriticalTaskFailure(f"Critical task {task_name} blocked by failed dependency")
-                else:
-                    self.audit_logger.log_task_skip(task_name, "dependency_failed")
-                    summary["skipped_tasks"] += 1
+        # Wavefront execution: every task whose dependencies have resolved is
+        # submitted to the pool, so independent tasks overlap on the cluster.
+        # Dependency counts come from the graph topological_sort just built.
+        names, adj, in_degree = self._task_graph
+        children = {names[i]: [names[j] for j in adj[i]] for i in range(len(names))}
+        remaining_deps = dict(zip(names, in_degree))
+        
+        ready = deque(task for task in execution_plan if remaining_deps[task] == 0)
+        pending = {}  # future -> (task_name, content_hash)
+        
+        def release(task: str) -> None:
+            for child in children[task]:
+                remaining_deps[child] -= 1
+                if remaining_deps[child] == 0:
+                    ready.append(child)
+        
+        max_workers = max(1, min(self._config_value('max_parallel_tasks', 8), len(execution_plan)))
+        previous_conf = self._apply_spark_conf(AQE_CONF)
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            while ready or pending:
+                while ready:
+                    task_name = ready.popleft()
+                    prepared = self._prepare_task(
+                        task_name, tasks[task_name], executors, run_mode, summary
+                    )
+                    if prepared is None:
+                        release(task_name)
+                        continue
+                    
+                    executor, content_hash = prepared
+                    future = pool.submit(
+                        self.execute_task_with_retries,
+                        task_name=task_name,
+                        task_config=tasks[task_name],
+                        executor=executor,
+                        max_retries=tasks[task_name].get('max_retries', 2)
+                    )
+                    pending[future] = (task_name, content_hash)
+                
+                if not pending:
                     continue
-            
-            # Execute with retries
-            executor = executors.get(task_name)
-            if not executor:
-                print(f"❌ No executor found for {task_name}")
-                summary["failed_tasks"] += 1
-                summary["failed_tasks_list"].append(task_name)
-                continue
-            
-            success, result = self.execute_task_with_retries(
-                task_name=task_name,
-                task_config=task_config,
-                executor=executor,
-                max_retries=task_config.get('max_retries', 2)
-            )
-            
-            self.task_results[task_name] = result
-            summary["task_results"][task_name] = result
-            
-            if success:
-                summary["successful_tasks"] += 1
-            else:
-                summary["failed_tasks"] += 1
-                summary["failed_tasks_list"].append(task_name)
                 
-                # Stop if critical
-                if task_config.get('critical', True):
-                    raise CriticalTaskFailure(f"Critical task {task_name} failed")
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_name, content_hash = pending.pop(future)
+                    success, result = future.result()
+                    
+                    self.task_results[task_name] = result
+                    summary["task_results"][task_name] = result
+                    
+                    if success:
+                        summary["successful_tasks"] += 1
+                        snapshot = content_hash and self._output_snapshot(tasks[task_name])
+                        if snapshot:
+                            self.audit_logger.record_cached_output(task_name, content_hash, snapshot)
+                    else:
+                        summary["failed_tasks"] += 1
+                        summary["failed_tasks_list"].append(task_name)
+                        
+                        # Stop if critical
+                        if tasks[task_name].get('critical', True):
+                            raise CriticalTaskFailure(f"Critical task {task_name} failed")
+                    
+                    release(task_name)
+                
+                # Task boundary: commit the terminal rows of everything that just finished
+                self.audit_logger.flush()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            self._restore_spark_conf(previous_conf)
+            # A critical failure skips end_run; keep the task_runs rows repair depends on
+            try:
+                self.audit_logger.flush()
+            except Exception as e:
+                print(f"⚠️  Could not flush audit rows: {type(e).__name__}: {e}")
         
         # 3. Final status
         overall_success = summary["failed_tasks"] == 0
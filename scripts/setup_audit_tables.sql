@@ -45,6 +45,9 @@ CREATE TABLE IF NOT EXISTS data_quality_checks (
 )
 USING DELTA;
 
+-- NDJSON error files written by AuditLogger, bulk-loaded into error_log
+CREATE VOLUME IF NOT EXISTS error_log_files;
+
 -- Optional tables (documented in config/schemas.yml)
 CREATE TABLE IF NOT EXISTS error_log (
   run_id STRING,